@@ -1,9 +1,124 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from collections import namedtuple
+from numba import njit, prange
+
+MIN_STD_DEV = 1e-7  # float32 noise floor, below this the strategy is treated as flat
+
+# Lightweight output of commodity_momentum_strategy (verbose=False)
+StrategyResult = namedtuple('StrategyResult', ['strategy_returns', 'cum_returns', 'sharpe', 'max_dd', 'ann_ret', 'ann_std'])
+
+
+@njit(cache=True, parallel=True)
+def top_bottom_signals(arr, K):
+    """
+    Long (+1) the K highest and short (-1) the K lowest values of each row, NaN stays neutral (0).
+    Each row is scanned once, keeping the current top-K / bottom-K candidates in two small buffers.
+    A commodity picked by both sets (fewer than 2K valid values, or ties) nets to 0, so the book never turns net short.
+    Inputs:
+        - arr: T x N array of rolling returns
+        - K: Number of commodities to buy/sell
+    Output:
+        - T x N int8 array of trading signals
+    """
+    T, N = arr.shape
+    signals = np.zeros((T, N), dtype=np.int8)
+    for t in prange(T):
+        top_idx = np.empty(K, dtype=np.int64)
+        bot_idx = np.empty(K, dtype=np.int64)
+        count = 0
+        worst_top = 0  # slot holding the smallest of the current top-K
+        worst_bot = 0  # slot holding the largest of the current bottom-K
+        for n in range(N):
+            value = arr[t, n]
+            if np.isnan(value):  # rows where the rolling window is not yet full are all NaN
+                continue
+            if count < K:
+                top_idx[count] = n
+                bot_idx[count] = n
+                count += 1
+                if count == K:
+                    for j in range(K):
+                        if arr[t, top_idx[j]] < arr[t, top_idx[worst_top]]:
+                            worst_top = j
+                        if arr[t, bot_idx[j]] > arr[t, bot_idx[worst_bot]]:
+                            worst_bot = j
+                continue
+            if value > arr[t, top_idx[worst_top]]:
+                top_idx[worst_top] = n
+                for j in range(K):
+                    if arr[t, top_idx[j]] < arr[t, top_idx[worst_top]]:
+                        worst_top = j
+            if value < arr[t, bot_idx[worst_bot]]:
+                bot_idx[worst_bot] = n
+                for j in range(K):
+                    if arr[t, bot_idx[j]] > arr[t, bot_idx[worst_bot]]:
+                        worst_bot = j
+        for j in range(count):
+            signals[t, top_idx[j]] += 1
+            signals[t, bot_idx[j]] -= 1
+    return signals
+
+
+def cumulative_sums(arr):
+    """
+    Running totals used to derive rolling sums for any window by differencing.
+    Accumulated in float64 so the window differences keep float32 precision.
+    Inputs:
+        - arr: T x N array of period returns
+    Output:
+        - (T+1) x N cumulative sums (NaN counted as 0) and cumulative counts of available values
+    """
+    N = arr.shape[1]
+    cum_sums = np.vstack([np.zeros((1, N)), np.nancumsum(arr, axis=0, dtype=np.float64)])
+    cum_counts = np.vstack([np.zeros((1, N), dtype=np.int64), np.cumsum(~np.isnan(arr), axis=0)])
+    return cum_sums, cum_counts
+
+
+def rolling_sums(cum_sums, cum_counts, window):
+    """
+    Rolling sums over the past `window` periods, NaN until the window is full (same as rolling().sum()).
+    Inputs:
+        - cum_sums, cum_counts: output of cumulative_sums
+        - window: Number of periods to look back
+    Output:
+        - T x N float32 array of rolling sums
+    """
+    T, N = cum_sums.shape[0] - 1, cum_sums.shape[1]
+    rolling = np.full((T, N), np.nan, dtype=np.float32)
+    window_sums = cum_sums[window:] - cum_sums[:-window]
+    window_full = (cum_counts[window:] - cum_counts[:-window]) == window
+    rolling[window - 1:] = np.where(window_full, window_sums, np.nan)
+    return rolling
+
+
+def long_short_returns(signals, returns, K):
+    """
+    Returns of the equally weighted long/short portfolio, trading each period on the previous period's signals.
+    Inputs:
+        - signals: T x N array of trading signals
+        - returns: T x N array of period returns, with NaN already replaced by 0
+        - K: Number of commodities bought/sold
+    Output:
+        - length T array of strategy returns (0 for the first period, which has no signal yet)
+    """
+    strategy_returns = np.zeros(returns.shape[0], dtype=returns.dtype)
+    np.einsum('tn,tn->t', signals[:-1], returns[1:], out=strategy_returns[1:])
+    strategy_returns /= 2 * K
+    return strategy_returns
+
 
 class CommodityMomentum:
     def __init__(self, data):
+        # Polars frames (eager or lazy) are accepted too, the date column becomes the index
+        if hasattr(data, 'collect'):
+            data = data.collect()
+        if hasattr(data, 'to_pandas'):
+            data = data.to_pandas()
+            non_numeric = data.select_dtypes(exclude='number').columns
+            if len(non_numeric):
+                data = data.set_index(non_numeric[0])
         self.data = data
 
     def generate_rolling_returns(self, range=12):  # default yearly
@@ -13,58 +128,56 @@ class CommodityMomentum:
         Output:
             - dataframe with returns in the past X periods at each point in time
         """
-        return self.data.rolling(window=range).sum()
+        returns = self.data.to_numpy(dtype=np.float32)
+        rolling = rolling_sums(*cumulative_sums(returns), range)
+        return pd.DataFrame(rolling, index=self.data.index, columns=self.data.columns)
 
-    def commodity_momentum_strategy(self, K, X, RiskFreeRate):
+    def commodity_momentum_strategy(self, K, X, RiskFreeRate, verbose=False):
         """
         Buy the top K best performing commodity(ies) in the past X periods, and sell the bottom K performing commodity(ies).
         Inputs:
             - K: Number of commodities to buy/sell
             - X: Number of periods to look back
             - Risk Free Rate
+            - verbose: Also return the signals, rolling returns and raw returns of every commodity
         Returns:
-            - DataFrame with strategy returns
-            - Sharpe Ratio (in DataFrame attributes)
-            - Max Drawdown
-            - Average Yearly Return
-            - Yearly Standard Deviation
+            - StrategyResult with strategy returns, cumulative returns, Sharpe Ratio, Max Drawdown,
+              Average Yearly Return and Yearly Standard Deviation
+            - If verbose, a DataFrame with strategy returns, signals, rolling and raw returns instead
+              (metrics in DataFrame attributes)
         """
         rolling_data = self.generate_rolling_returns(range=X)
-
-        def get_top_bottom_commodities(row, top_n=K, bottom_n=K):
-            ranked = row.rank(ascending=False, method='min', na_option='keep')
-            long_positions = (ranked <= top_n).astype(int)
-            short_positions = -1 * (ranked > (len(row) - bottom_n)).astype(int)
-            return long_positions + short_positions
-
-        trading_signals = rolling_data.apply(get_top_bottom_commodities, axis=1)
-        strategy_returns = (trading_signals.shift(1) * self.data).sum(axis=1) / (2 * K)
+        signals = top_bottom_signals(rolling_data.to_numpy(dtype=np.float32), K)
+        returns = np.nan_to_num(self.data.to_numpy(dtype=np.float32))
+        strategy_returns = pd.Series(long_short_returns(signals, returns, K), index=self.data.index)
         annualized_returns = strategy_returns.mean() * 12
         annualized_std_dev = strategy_returns.std() * np.sqrt(12)
-        sharpe = (annualized_returns - RiskFreeRate) / annualized_std_dev if annualized_std_dev != 0 else 0
-        cum_returns = strategy_returns.cumsum()
-
-        running_max = cum_returns.cummax()
-        drawdowns = cum_returns - running_max
-        max_drawdown = drawdowns.min()
-
-        # Create expanded results DataFrame with signals and rolling returns
-        results = pd.DataFrame({
-            'Strategy_Returns': strategy_returns,
-            'Cumulative_Returns': cum_returns
-        })
-        
-        # Add trading signals with prefix 'Signal_'
-        for column in trading_signals.columns:
-            results[f'Signal_{column}'] = trading_signals[column]
-        
-        # Add rolling returns with prefix 'Rolling_'
-        for column in rolling_data.columns:
-            results[f'Rolling_{column}'] = rolling_data[column]
-            
-        # Add raw returns with prefix 'Return_'
-        for column in self.data.columns:
-            results[f'Return_{column}'] = self.data[column]
+        sharpe = (annualized_returns - RiskFreeRate) / annualized_std_dev if annualized_std_dev > MIN_STD_DEV else 0
+        cum_returns = np.cumsum(strategy_returns.to_numpy())
+        max_drawdown = (cum_returns - np.maximum.accumulate(cum_returns)).min()
+        cum_returns = pd.Series(cum_returns, index=self.data.index)
+
+        # Print metrics
+        print(f"Sharpe Ratio: {sharpe:.2f}")
+        print(f"Max Drawdown: {max_drawdown:.2f}")
+        print(f"Average Yearly Return: {annualized_returns:.2f}")
+        print(f"Yearly Standard Deviation: {annualized_std_dev:.2f}")
+
+        if not verbose:
+            return StrategyResult(strategy_returns, cum_returns, sharpe, max_drawdown,
+                                  annualized_returns, annualized_std_dev)
+
+        # Create expanded results DataFrame with signals, rolling returns and raw returns in a single concat
+        trading_signals = pd.DataFrame(signals, index=rolling_data.index, columns=rolling_data.columns)
+        results = pd.concat([
+            pd.DataFrame({
+                'Strategy_Returns': strategy_returns,
+                'Cumulative_Returns': cum_returns
+            }),
+            trading_signals.add_prefix('Signal_'),
+            rolling_data.add_prefix('Rolling_'),
+            self.data.add_prefix('Return_')
+        ], axis=1)
         
         # Add strategy metrics as attributes
         results.attrs['Sharpe_Ratio'] = sharpe
@@ -72,12 +185,6 @@ class CommodityMomentum:
         results.attrs['Annualized_Return'] = annualized_returns
         results.attrs['Annualized_StdDev'] = annualized_std_dev
         
-        # Print metrics
-        print(f"Sharpe Ratio: {sharpe:.2f}")
-        print(f"Max Drawdown: {max_drawdown:.2f}")
-        print(f"Average Yearly Return: {annualized_returns:.2f}")
-        print(f"Yearly Standard Deviation: {annualized_std_dev:.2f}")
-        
         return results
 
     def compare_momentum_periods(self, range=[3, 6, 12], K=4, RiskFreeRate=0.02):
@@ -90,26 +197,26 @@ class CommodityMomentum:
         Returns:
             - DataFrame with metrics for each lookback period
         """
+        returns = self.data.to_numpy(dtype=np.float32)
+        filled_returns = np.nan_to_num(returns)
+
+        # Cumulative sums are built once and shared by every lookback period
+        cum_sums, cum_counts = cumulative_sums(returns)
+
         results = {}
         for period in range:
             # Calculate returns for this lookback period
-            roll_data = self.data.rolling(window=period).sum()
+            roll_data = rolling_sums(cum_sums, cum_counts, period)
             
             # Get trading signals
-            def get_top_bottom_commodities(row):
-                ranked = row.rank(ascending=False, method='min', na_option='keep')
-                long_positions = (ranked <= K).astype(int)
-                short_positions = -1 * (ranked > (len(row) - K)).astype(int)
-                return long_positions + short_positions
-
-            signals = roll_data.apply(get_top_bottom_commodities, axis=1)
-            strategy_returns = (signals.shift(1) * self.data).sum(axis=1) / (2 * K)
+            signals = top_bottom_signals(roll_data, K)
+            strategy_returns = long_short_returns(signals, filled_returns, K)
             
             # Calculate metrics
             ann_returns = strategy_returns.mean() * 12
-            ann_std_dev = strategy_returns.std() * np.sqrt(12)
-            sharpe = (ann_returns - RiskFreeRate) / ann_std_dev if ann_std_dev != 0 else 0
-            cum_returns = (1 + strategy_returns).cumprod().iloc[-1] - 1 if not strategy_returns.empty else 0
+            ann_std_dev = strategy_returns.std(ddof=1) * np.sqrt(12)
+            sharpe = (ann_returns - RiskFreeRate) / ann_std_dev if ann_std_dev > MIN_STD_DEV else 0
+            cum_returns = np.prod(1 + strategy_returns) - 1 if strategy_returns.size else 0
             
             results[period] = {
                 'Annualized_Return': ann_returns,
@@ -123,9 +230,15 @@ class CommodityMomentum:
     def plot_strategy_returns(self, strategy_returns):
         """
         Plot the returns of a single momentum strategy.
+        Inputs:
+            - strategy_returns: StrategyResult or DataFrame from commodity_momentum_strategy
         """
+        if isinstance(strategy_returns, StrategyResult):
+            cum_returns = strategy_returns.cum_returns
+        else:
+            cum_returns = strategy_returns['Cumulative_Returns']
         fig, ax = plt.subplots(figsize=(10, 6))
-        strategy_returns['Cumulative_Returns'].plot(ax=ax)
+        cum_returns.plot(ax=ax)
         ax.set_title('Commodity Momentum Strategy')
         ax.set_xlabel('Time')
         ax.set_ylabel('Cumulative Returns')
@@ -1,5 +1,8 @@
 import pandas as pd
+import numpy as np
 import os
+import time
+import hashlib
 import yfinance as yf
 
 DEFAULT_COMMODITIES = {
@@ -32,6 +35,8 @@ DEFAULT_COMMODITIES = {
     "Cocoa": "CC=F"
 }
 
+CACHE_MAX_AGE = 24 * 60 * 60  # seconds a cached download stays fresh
+
 class LoadData:
     def __init__(self, path=None):
         self.path = path
@@ -66,32 +71,44 @@ class LoadData:
             raise ValueError("Invalid period. Choose 'daily', 'monthly', 'quarterly', or 'yearly'")
         
         threshold = threshold_map[period]
-        outlier_mask = abs(data) > threshold
+        values = data.to_numpy(dtype=float).reshape(len(data), -1)
+        outlier_mask = np.abs(values) > threshold
+        replacement = np.full(values.shape, np.nan)
         
-        # Create a copy to avoid modifying the original data
-        cleaned_data = data.copy()
+        # Neighbours are taken on each commodity's own calendar, skipping the rows where it has no data
+        for j in range(values.shape[1]):
+            available = ~np.isnan(values[:, j])
+            if not available.any():
+                continue
+            # 7-value window centred on each value (NaN-padded at the edges), centre value dropped
+            padded = np.pad(values[available, j], 3, constant_values=np.nan)
+            windows = np.lib.stride_tricks.sliding_window_view(padded, 7)
+            neighbours = np.delete(windows, 3, axis=-1)
+            
+            # Mean of the 3 previous and 3 next values, ignoring missing ones at the edges
+            counts = np.sum(~np.isnan(neighbours), axis=-1)
+            with np.errstate(invalid='ignore'):
+                replacement[available, j] = np.nansum(neighbours, axis=-1) / counts
         
-        # For each outlier, replace with mean of 3 previous and 3 next values
-        for idx in data[outlier_mask].index:
-            prev_vals = data.loc[:idx].tail(4)[:-1]  # 3 previous values
-            next_vals = data.loc[idx:].head(4)[1:]   # 3 next values
-            replacement = pd.concat([prev_vals, next_vals]).mean()
-            cleaned_data.loc[idx] = replacement
+        # Only outliers are replaced, the original data is left untouched
+        cleaned_data = data.mask(outlier_mask.reshape(data.shape), replacement.reshape(data.shape))
             
         return cleaned_data
 
     def calculate_period_returns(self, data, period='daily', remove_outliers=True):
         """
         Calculate returns for the specified period and optionally remove outliers.
+        Works on the whole price DataFrame at once (one column per commodity).
         """
         if period == 'daily':
-            returns = data['Adj Close'].pct_change()
+            # Each commodity on its own trading calendar: days it did not trade stay NaN instead of a 0 return
+            returns = data.ffill().pct_change(fill_method=None).where(data.notna())
         elif period == 'monthly':
-            returns = data['Adj Close'].resample('M').last().pct_change()
+            returns = data.resample('M').last().pct_change()
         elif period == 'quarterly':
-            returns = data['Adj Close'].resample('Q').last().pct_change()
+            returns = data.resample('Q').last().pct_change()
         elif period == 'yearly':
-            returns = data['Adj Close'].resample('Y').last().pct_change()
+            returns = data.resample('Y').last().pct_change()
         else:
             raise ValueError("Invalid period. Choose 'daily', 'monthly', 'quarterly', or 'yearly'")
         
@@ -114,18 +131,34 @@ class LoadData:
         else:
             commodities_dict = {k: v for k, v in DEFAULT_COMMODITIES.items() if k in commodities}
 
+        cache_path = self._cache_path(commodities_dict, years, return_period, remove_outliers)
+        if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < CACHE_MAX_AGE:
+            print(f"Loading cached data from {cache_path}")
+            try:
+                return pd.read_parquet(cache_path)
+            except Exception as error:  # unreadable cache file, treat as a miss
+                print(f"Warning: could not read {cache_path} ({error}), downloading again")
+
         end_date = pd.Timestamp.today()
         start_date = end_date - pd.DateOffset(years=years)
 
         print(f"Fetching data from {start_date.date()} to {end_date.date()}")
-        commodity_data = {}
-        for name, ticker in commodities_dict.items():
-            data = yf.download(ticker, start=start_date, end=end_date)
-            data['Adj Close'] = data['Adj Close'].astype(float)
-            returns = self.calculate_period_returns(data, return_period, remove_outliers)
-            commodity_data[name] = returns
+        # Single batched request, yfinance fetches the tickers concurrently
+        raw = yf.download(list(commodities_dict.values()), start=start_date, end=end_date,
+                          group_by='ticker', threads=True, auto_adjust=False)
+        prices = raw.xs('Adj Close', level=1, axis=1)[list(commodities_dict.values())]
+        prices.columns = list(commodities_dict.keys())
+        returns = self.calculate_period_returns(prices, return_period, remove_outliers)
 
-        combined_df = pd.DataFrame(commodity_data).dropna(how='all') # can fillna(0) if needed - investigate this in the future...
+        combined_df = returns.dropna(how='all').astype(np.float32) # can fillna(0) if needed - investigate this in the future...
+
+        # yfinance reports failed tickers as all-NaN columns instead of raising, never cache those
+        failed = combined_df.columns[combined_df.isna().all()].tolist()
+        if combined_df.empty or failed:
+            print(f"Warning: download incomplete (no data for {failed or 'any commodity'}), not caching the result")
+        else:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            self._write_parquet(combined_df, cache_path)
 
         self._save_combined_data(combined_df) # comment out to avoid systematically saving the data (for example, for exploration purposes)
         return combined_df
@@ -135,5 +168,23 @@ class LoadData:
         os.makedirs("./data", exist_ok=True)
         save_path = os.path.join("./data", filename)
         combined_df.to_csv(save_path)
+        self._write_parquet(combined_df, os.path.splitext(save_path)[0] + ".parquet")
         print(f"Combined data saved to {save_path}")
 
+    def _write_parquet(self, df, path):
+        # Best effort: Parquet needs pyarrow or fastparquet, without them only the CSV is saved and nothing is cached
+        # Write next to the target then move it into place, an interrupted run never leaves a truncated file behind
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path, compression='snappy')
+            os.replace(tmp_path, path)
+        except ImportError:
+            print(f"Warning: no Parquet engine installed (pyarrow or fastparquet), skipping {path}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _cache_path(self, commodities_dict, years, return_period, remove_outliers):
+        key = repr((list(commodities_dict.values()), years, return_period, remove_outliers))
+        return os.path.join("./data", "cache", hashlib.sha1(key.encode()).hexdigest()[:16] + ".parquet")
+